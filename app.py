@@ -3,16 +3,21 @@ import pandas as pd
 from datetime import datetime
 import io
 import time
-import smtplib
-from email.mime.text import MIMEText
 import gspread
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseUpload
 from google.cloud import vision
 from gspread.exceptions import APIError
+from gspread.utils import rowcol_to_a1
 import re
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image, ImageEnhance
+from mailer import MailQueue
+from auth_index import CredentialIndex, AUTH_REFRESH_INTERVAL
+from ocr_batch import OCR_MAX_WORKERS, VISION_MAX_QPS, RateLimiter, open_image_zip, read_zip_image, diff_profile_updates
 
 # --- 1. 系統設定區 ---
 st.set_page_config(page_title="股務管理系統 (終極完整版)", layout="wide")
@@ -22,10 +27,12 @@ SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 SENDER_EMAIL = ""  
 SENDER_PASSWORD = "" 
+MAIL_DB_PATH = "mail_outbox.db"  # 寄件匣 (重啟後補寄)
 
 # --- 2. Google 核心服務整合 ---
 class GoogleServices:
-    def __init__(self):
+    def __init__(self, mailer=None):
+        self.mailer = mailer
         self.connect()
 
     def connect(self):
@@ -55,16 +62,56 @@ class GoogleServices:
             try: self.ws_log = self.sh.worksheet("change_logs")
             except: self.ws_log = None
 
-            # 2. Drive 連線 (存圖用)
+            # 登入索引 (登入/密碼查詢不再即時讀表)
+            self.auth = CredentialIndex()
+            self.start_auth_refresh()
+
+            # 2. Drive 連線 (存圖用)；googleapiclient 非執行緒安全，每個執行緒各自建立
+            self._local = threading.local()
+            self._folder_lock = threading.Lock()
+            self._folder_id = None
             self.drive_service = build('drive', 'v3', credentials=self.creds)
+            self._local.drive = self.drive_service
 
             # 3. Vision 連線 (OCR用)
             self.vision_client = vision.ImageAnnotatorClient(credentials=self.creds)
+            self.vision_limiter = RateLimiter(VISION_MAX_QPS)
 
         except Exception as e:
             st.error(f"連線失敗，請檢查網路或 Secrets 設定: {e}")
             st.stop()
 
+    # --- 重新載入登入索引 (同時僅一個重載) ---
+    def reload_auth_index(self):
+        if not self.auth.reload_lock.acquire(blocking=False): return
+        try:
+            for ws, is_admin in ((self.ws_adm, True), (self.ws_sh, False)):
+                for i in range(3): # 重試機制
+                    try:
+                        started = time.monotonic()
+                        self.auth.load(ws.get_all_values()[1:], is_admin, started); break
+                    except APIError: time.sleep(1)
+        finally: self.auth.reload_lock.release()
+
+    # --- 背景定期重載 (同步表單上直接修改的密碼 / 刪除的帳號) ---
+    def start_auth_refresh(self):
+        def loop():
+            while True:
+                try: self.reload_auth_index()
+                except Exception: pass
+                time.sleep(AUTH_REFRESH_INTERVAL)
+        threading.Thread(target=loop, name="auth-index", daemon=True).start()
+
+    # --- 登入索引查詢 (未命中時只讀單列) ---
+    def lookup_auth(self, uid, is_admin):
+        u = self.auth.get(is_admin, uid)
+        if u or self.auth.is_missing(is_admin, uid): return u
+        ws = self.ws_adm if is_admin else self.ws_sh
+        cell = ws.find(str(uid).strip(), in_column=1)
+        if not cell: self.auth.mark_missing(is_admin, uid); return None
+        self.auth.put_row(ws.row_values(cell.row), is_admin)
+        return self.auth.get(is_admin, uid)
+
     # --- 讀取資料 (含欄位清理) ---
     def get_df(self, table_name):
         for i in range(3): # 重試機制
@@ -82,29 +129,45 @@ class GoogleServices:
             except APIError: time.sleep(1)
         return pd.DataFrame()
 
-    # --- 圖片上傳 Google Drive ---
-    def upload_image_to_drive(self, file_obj, filename):
-        try:
+    # --- Drive 連線 (每執行緒一份) ---
+    def get_drive(self):
+        drive = getattr(self._local, "drive", None)
+        if drive is None:
+            drive = build('drive', 'v3', credentials=self.creds, cache_discovery=False)
+            self._local.drive = drive
+        return drive
+
+    # --- 圖片資料夾 (查一次後快取) ---
+    def get_image_folder_id(self, drive):
+        with self._folder_lock:
+            if self._folder_id: return self._folder_id
             # 檢查資料夾是否存在
             query = "name='StockSystem_Images' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-            results = self.drive_service.files().list(q=query, fields="files(id)").execute()
+            results = drive.files().list(q=query, fields="files(id)").execute()
             files = results.get('files', [])
             
             if not files:
                 file_metadata = {'name': 'StockSystem_Images', 'mimeType': 'application/vnd.google-apps.folder'}
-                folder = self.drive_service.files().create(body=file_metadata, fields='id').execute()
-                folder_id = folder.get('id')
+                folder = drive.files().create(body=file_metadata, fields='id').execute()
+                self._folder_id = folder.get('id')
             else:
-                folder_id = files[0]['id']
+                self._folder_id = files[0]['id']
+            return self._folder_id
+
+    # --- 圖片上傳 Google Drive ---
+    def upload_image_to_drive(self, file_obj, filename):
+        try:
+            drive = self.get_drive()
+            folder_id = self.get_image_folder_id(drive)
 
             # 上傳檔案
             file_metadata = {'name': filename, 'parents': [folder_id]}
             file_obj.seek(0) # 重置指標
             media = MediaIoBaseUpload(file_obj, mimetype=file_obj.type, resumable=True)
-            file = self.drive_service.files().create(body=file_metadata, media_body=media, fields='id, webViewLink').execute()
+            file = drive.files().create(body=file_metadata, media_body=media, fields='id, webViewLink').execute()
             
             # 開啟公開讀取權限
-            self.drive_service.permissions().create(fileId=file.get('id'), body={'role': 'reader', 'type': 'anyone'}).execute()
+            drive.permissions().create(fileId=file.get('id'), body={'role': 'reader', 'type': 'anyone'}).execute()
             return file.get('webViewLink')
         except Exception as e:
             return None
@@ -123,9 +186,11 @@ class GoogleServices:
         except: return image_bytes
 
     # --- OCR 辨識 ---
-    def ocr_id_card(self, content):
+    def ocr_id_card(self, content, limiter=None):
         try:
             enhanced_content = self.preprocess_image(content)
+            # 前處理可並行，僅 Vision 呼叫受限流
+            if limiter: limiter.wait()
             image = vision.Image(content=enhanced_content)
             response = self.vision_client.text_detection(image=image)
             texts = response.text_annotations
@@ -181,6 +246,7 @@ class GoogleServices:
                         changes.append([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), editor, tax_id, key, old_val, new_val])
                         col_idx = headers.index(key) + 1
                         self.ws_sh.update_cell(cell.row, col_idx, new_val)
+            self.sync_auth_profile(tax_id, new_data)
             
             if changes and self.ws_log:
                 self.ws_log.append_rows(changes)
@@ -188,6 +254,67 @@ class GoogleServices:
             return True, "資料已儲存 (無欄位變更)"
         except Exception as e: return False, str(e)
 
+    # --- 同步登入索引 (姓名/Email/提示) ---
+    def sync_auth_profile(self, tax_id, new_data):
+        fields = {k: str(new_data[f]) for k, f in (("name", "name"), ("email", "email"), ("hint", "password_hint")) if f in new_data}
+        if fields: self.auth.update(False, tax_id, **fields)
+
+    # --- 批次資料更新 (單次寫入 + Log) ---
+    def batch_update_shareholder_profiles(self, editor, updates):
+        try:
+            rows = self.ws_sh.get_all_values()
+            if not rows: return False, "找不到資料"
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            cells, changes, missing = diff_profile_updates(rows, updates, editor, now)
+
+            if cells: self.ws_sh.batch_update([{'range': rowcol_to_a1(r, c), 'values': [[v]]} for r, c, v in cells])
+            for tax_id, new_data in updates.items(): self.sync_auth_profile(tax_id, new_data)
+            if changes and self.ws_log: self.ws_log.append_rows(changes)
+            msg = f"已更新 {len(updates) - len(missing)} 位股東，共 {len(changes)} 個欄位"
+            if missing: msg += f" (找不到: {', '.join(missing)})"
+            return True, msg
+        except Exception as e: return False, str(e)
+
+    # --- 批次證件辨識 (ZIP，檔名為統編；只辨識，不上傳) ---
+    def bulk_ocr_from_zip(self, zip_bytes, max_workers=OCR_MAX_WORKERS):
+        ok, res = open_image_zip(zip_bytes)
+        if not ok: return False, res
+        zf, items, skipped = res
+
+        # 各 worker 自行解壓，避免一次全部載入記憶體
+        def work(info):
+            try: content = read_zip_image(zf, info)
+            except Exception as e: return False, str(e)
+            return self.ocr_id_card(content, self.vision_limiter)
+
+        workers = max(1, min(int(max_workers), OCR_MAX_WORKERS))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            jobs = [pool.submit(work, info) for _, info, _ in items]
+            results = []
+            for (tid, _, _), job in zip(items, jobs):
+                s, r = job.result()
+                results.append({"tax_id": tid, "ok": s, "data": r if s else {}, "error": "" if s else r})
+        results += [{"tax_id": tid, "ok": False, "data": {}, "error": reason} for tid, reason in skipped]
+        return True, results
+
+    # --- 批次存檔 (僅已採用且在名簿內的統編才上傳 Drive) ---
+    def archive_bulk_images(self, zip_bytes, tax_ids, max_workers=OCR_MAX_WORKERS):
+        ok, res = open_image_zip(zip_bytes)
+        if not ok: return {}
+        zf, items, _ = res
+        wanted = set(tax_ids)
+
+        def archive(tid, info, mime):
+            try: f = io.BytesIO(read_zip_image(zf, info))
+            except Exception: return None
+            f.type = mime
+            return self.upload_image_to_drive(f, f"{tid}_bulk_{int(time.time())}{os.path.splitext(info.filename)[1].lower()}")
+
+        workers = max(1, min(int(max_workers), OCR_MAX_WORKERS))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            jobs = {tid: pool.submit(archive, tid, info, mime) for tid, info, mime in items if tid in wanted}
+            return {tid: job.result() for tid, job in jobs.items()}
+
     # --- 批次匯入 (全量處理) ---
     def batch_import_from_excel(self, df_excel, replace_shares=False):
         try:
@@ -238,9 +365,24 @@ class GoogleServices:
             self.ws_sh.clear()
             self.ws_sh.append_row(headers)
             self.ws_sh.append_rows(final_data)
+            self.auth.load(final_data, False, time.monotonic())
             return True, f"匯入成功，共處理 {cnt} 筆資料"
         except Exception as e: return False, str(e)
 
+    # --- 通知信 (僅排入佇列) ---
+    def notify(self, email, template, **kw):
+        if not self.mailer or not email: return
+        try: self.mailer.send_template(str(email), template, **kw)
+        except Exception: pass
+
+    def get_contact(self, tax_id):
+        try:
+            cell = self.ws_sh.find(str(tax_id), in_column=1)
+            if not cell: return "", ""
+            row = self.ws_sh.row_values(cell.row)
+            return (row[1] if len(row)>1 else ""), (row[7] if len(row)>7 else "")
+        except: return "", ""
+
     # --- 申請單邏輯 ---
     def add_request(self, applicant_id, amount, reason):
         try:
@@ -261,7 +403,9 @@ class GoogleServices:
 
     def approve_request(self, req_id, date, s_id, b_id, amount):
         try:
-            if not self.transfer_shares(date, s_id, b_id, amount, "交易申請"): return False, "過戶失敗"
+            # 買方收過戶通知；賣方 (申請人) 改收核准通知
+            ok, m = self.transfer_shares(date, s_id, b_id, amount, "交易申請", req_id=req_id)
+            if not ok: return False, f"過戶失敗: {m}"
             cell = self.ws_req.find(str(req_id), in_column=1)
             if cell:
                 self.ws_req.update_cell(cell.row, 4, b_id) # Target
@@ -275,6 +419,9 @@ class GoogleServices:
             if cell:
                 self.ws_req.update_cell(cell.row, 6, "Rejected")
                 self.ws_req.update_cell(cell.row, 8, reason)
+                applicant = self.ws_req.cell(cell.row, 3).value
+                name, email = self.get_contact(applicant)
+                self.notify(email, "rejected", name=name, req_id=req_id, reason=reason)
             return True, "已退件"
         except Exception as e: return False, str(e)
 
@@ -288,20 +435,37 @@ class GoogleServices:
         except: return False, "Error"
 
     # --- 股權轉讓核心 ---
-    def transfer_shares(self, date, s_id, b_id, amount, reason):
+    def transfer_shares(self, date, s_id, b_id, amount, reason, req_id=None):
         try:
             s_cell = self.ws_sh.find(s_id, in_column=1)
             b_cell = self.ws_sh.find(b_id, in_column=1)
             if not s_cell or not b_cell: return False, "找不到買賣方"
             
-            s_shares = int(self.ws_sh.cell(s_cell.row, 10).value or 0)
-            b_shares = int(self.ws_sh.cell(b_cell.row, 10).value or 0)
+            # 一次讀整列 (含 name/email/shares_held)
+            s_row = self.ws_sh.row_values(s_cell.row)
+            b_row = self.ws_sh.row_values(b_cell.row)
+            s_shares = int((s_row[9] if len(s_row)>9 else 0) or 0)
+            b_shares = int((b_row[9] if len(b_row)>9 else 0) or 0)
             
             if s_shares < amount: return False, "賣方股數不足"
             
             self.ws_sh.update_cell(s_cell.row, 10, s_shares - amount)
             self.ws_sh.update_cell(b_cell.row, 10, b_shares + amount)
             self.ws_tx.append_row([str(date), s_id, b_id, amount, reason])
+            # 通知雙方 (只排入佇列)
+            d = date.strftime("%Y-%m-%d") if hasattr(date, "strftime") else str(date)
+            s_name = s_row[1] if len(s_row)>1 else s_id
+            b_name = b_row[1] if len(b_row)>1 else b_id
+            s_email = s_row[7] if len(s_row)>7 else ""
+            b_email = b_row[7] if len(b_row)>7 else ""
+            # 由申請單核准時，賣方收核准通知
+            if req_id is not None:
+                self.notify(s_email, "approved", name=s_name, req_id=req_id, amount=amount, buyer=b_name)
+            else:
+                self.notify(s_email, "transfer", name=s_name, date=d, seller=s_name, buyer=b_name,
+                            amount=amount, reason=reason, shares=s_shares - amount)
+            self.notify(b_email, "transfer", name=b_name, date=d, seller=s_name, buyer=b_name,
+                        amount=amount, reason=reason, shares=b_shares + amount)
             return True, "成功"
         except Exception as e: return False, str(e)
 
@@ -318,6 +482,7 @@ class GoogleServices:
             
             if cell: return False, "股東已存在"
             else: self.ws_sh.append_row(row_data)
+            self.auth.put_row(row_data, False)
             return True, "新增成功"
         except Exception as e: return False, str(e)
 
@@ -332,6 +497,7 @@ class GoogleServices:
         try:
             cell = self.ws_sh.find(tax_id, in_column=1)
             self.ws_sh.delete_rows(cell.row)
+            self.auth.remove(False, tax_id)
         except: pass
         
     def delete_batch_shareholders(self, ids):
@@ -349,36 +515,28 @@ class GoogleServices:
     # --- 登入與密碼 ---
     def verify_login(self, username, password, is_admin):
         try:
-            ws = self.ws_adm if is_admin else self.ws_sh
-            try: cell = ws.find(username, in_column=1)
-            except: time.sleep(1); cell = ws.find(username, in_column=1)
-            if not cell: return False, "無此帳號", None
-            row = ws.row_values(cell.row)
-            if is_admin:
-                p = row[1]; h = row[3] if len(row)>3 else ""; n = "管理員"
-            else:
-                n = row[1]; h = row[8] if len(row)>8 else ""; p = row[10] if len(row)>10 else ""
-                if p=="": p = username
-            if str(p)==str(password): return True, n, None
-            else: return False, "密碼錯誤", h
+            u = self.lookup_auth(username, is_admin)
+            if not u: return False, "無此帳號", None
+            if self.auth.check(u, password): return True, u['name'], None
+            else: return False, "密碼錯誤", u['hint']
         except Exception as e: return False, str(e), None
 
     def get_user_recovery_info(self, user_id, is_admin=False):
+        try:
+            u = self.lookup_auth(user_id, is_admin)
+            if u: return {"email": u['email'], "hint": u['hint']}
+            return None
+        except: return None
+
+    # 寄送密碼時才讀表 (索引只存雜湊)
+    def get_recovery_password(self, user_id, is_admin=False):
         try:
             ws = self.ws_adm if is_admin else self.ws_sh
             cell = ws.find(user_id, in_column=1)
-            if cell:
-                row_vals = ws.row_values(cell.row)
-                if is_admin:
-                    email = row_vals[2] if len(row_vals)>2 else ""
-                    hint = row_vals[3] if len(row_vals)>3 else ""
-                    pwd = row_vals[1]
-                else:
-                    email = row_vals[7] if len(row_vals)>7 else ""
-                    hint = row_vals[8] if len(row_vals)>8 else ""
-                    pwd = row_vals[10] if len(row_vals)>10 and row_vals[10]!="" else user_id
-                return {"email": email, "hint": hint, "password": pwd}
-            return None
+            if not cell: return None
+            row_vals = ws.row_values(cell.row)
+            if is_admin: return row_vals[1]
+            return row_vals[10] if len(row_vals)>10 and row_vals[10]!="" else user_id
         except: return None
 
     def update_password(self, uid, pwd, hint, admin=False):
@@ -389,20 +547,22 @@ class GoogleServices:
                 r = cell.row
                 if admin: ws.update_cell(r, 2, pwd); ws.update_cell(r, 4, hint)
                 else: ws.update_cell(r, 11, pwd); ws.update_cell(r, 9, hint)
+                self.auth.update(admin, uid, password=pwd, hint=hint)
                 return True
             return False
         except: return False
 
 @st.cache_resource
-def get_db_system(): return GoogleServices()
+def get_mailer(): return MailQueue(MAIL_DB_PATH, SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD)
+
+@st.cache_resource
+def get_db_system(): return GoogleServices(mailer=get_mailer())
 try: sys = get_db_system()
 except: st.error("連線逾時"); st.stop()
 
 # --- UI Dialogs ---
 def send_recovery_email(to, uid, pwd):
-    if not SENDER_EMAIL: return True, "模擬發送"
-    try:
-        msg=MIMEText(f"Pw:{pwd}"); msg['To']=to; s=smtplib.SMTP(SMTP_SERVER,SMTP_PORT); s.starttls(); s.login(SENDER_EMAIL,SENDER_PASSWORD); s.send_message(msg); s.quit(); return True,"OK"
+    try: return get_mailer().send_template(to, "recovery", uid=uid, pwd=pwd)
     except: return False,"Err"
 
 @st.dialog("🔑 忘記密碼")
@@ -412,7 +572,10 @@ def show_forgot_password_dialog():
         i = sys.get_user_recovery_info(u, u=="admin")
         if i:
             st.success(f"提示: {i['hint']}")
-            if i['email'] and st.button("寄送"): send_recovery_email(i['email'],u,i['password'])
+            if i['email'] and st.button("寄送"):
+                pwd = sys.get_recovery_password(u, u=="admin")
+                if pwd is None: st.error("無法取得密碼，請稍後再試")
+                else: send_recovery_email(i['email'],u,pwd)
         else: st.error("無")
 
 @st.dialog("🔑 修改密碼")
@@ -555,7 +718,7 @@ def run_main_app(role, user_name, user_id):
         if st.button("登出"): st.session_state.logged_in=False; st.rerun()
         
         if role == "admin":
-            menu = st.radio("選單", ["📊 股東名簿總覽", "✅ 審核交易申請", "📂 批次匯入", "➕ 新增股東", "💰 發行/增資", "🤝 股權過戶", "📝 交易歷史", "📝 修改紀錄查詢"])
+            menu = st.radio("選單", ["📊 股東名簿總覽", "✅ 審核交易申請", "📂 批次匯入", "🪪 批次證件辨識", "➕ 新增股東", "💰 發行/增資", "🤝 股權過戶", "📝 交易歷史", "📝 修改紀錄查詢", "📮 寄信失敗紀錄"])
         else:
             menu = st.radio("選單", ["👤 個人資料維護", "📝 我的持股", "📜 交易紀錄查詢", "✍️ 申請交易"])
 
@@ -624,6 +787,60 @@ def run_main_app(role, user_name, user_id):
                 if s: st.success(m)
                 else: st.error(m)
         
+        elif menu == "🪪 批次證件辨識":
+            st.header("批次證件辨識")
+            st.caption("上傳 ZIP，圖片檔名需為統編 (例: A123456789.jpg)；僅已採用的證件會存檔至 Drive")
+            workers = st.slider("並行數", 1, OCR_MAX_WORKERS, OCR_MAX_WORKERS)
+            up = st.file_uploader("ZIP", type=["zip"])
+            if up and st.button("開始辨識"):
+                with st.spinner("辨識中..."):
+                    s, res = sys.bulk_ocr_from_zip(up.getvalue(), workers)
+                if s: st.session_state.bulk_ocr = res; st.session_state.bulk_zip = up.getvalue()
+                else: st.error(res)
+
+            res = st.session_state.get("bulk_ocr")
+            if res:
+                df = sys.get_df("shareholders")
+                reg = {str(r['tax_id']).strip(): r for i, r in df.iterrows()} if not df.empty else {}
+                rows = []
+                for r in res:
+                    cur = reg.get(r['tax_id'])
+                    notes = [r['error']] if r['error'] else []
+                    if cur is None: notes.append("名簿無此統編")
+                    rows.append({
+                        "採用": bool(r['ok'] and cur is not None),
+                        "統編": r['tax_id'],
+                        "現有姓名": str(cur['name']) if cur is not None else "",
+                        "辨識姓名": r['data'].get('name', ""),
+                        "現有戶籍": str(cur['household_address']) if cur is not None else "",
+                        "辨識地址": r['data'].get('address', ""),
+                        "備註": "；".join(notes),
+                    })
+                review = st.data_editor(pd.DataFrame(rows), disabled=["統編", "現有姓名", "現有戶籍", "備註"],
+                                        hide_index=True, use_container_width=True)
+                if st.button("💾 寫入已採用", type="primary"):
+                    # 只有名簿內、辨識成功且已勾選的列才寫入並存檔
+                    ok_rows = pd.Series([r['ok'] for r in res], index=review.index)
+                    accepted = review[review["採用"] & ok_rows & review["統編"].isin(list(reg))]
+                    with st.spinner("存檔中..."):
+                        links = sys.archive_bulk_images(st.session_state.bulk_zip, list(accepted["統編"]), workers)
+                    updates = {}
+                    for i, r in accepted.iterrows():
+                        ud = {}
+                        if r["辨識姓名"]: ud['name'] = r["辨識姓名"]
+                        if r["辨識地址"]: ud['household_address'] = r["辨識地址"]
+                        if links.get(r["統編"]): ud['id_image_url'] = links[r["統編"]]
+                        if ud: updates[r["統編"]] = ud
+                    failed = [t for t in accepted["統編"] if not links.get(t)]
+                    if not updates: st.warning("沒有可寫入的資料")
+                    else:
+                        s, m = sys.batch_update_shareholder_profiles(st.session_state.user_name, updates)
+                        if s:
+                            st.success(m)
+                            del st.session_state["bulk_ocr"]; del st.session_state["bulk_zip"]
+                        else: st.error(m)
+                    if failed: st.warning(f"存檔上傳失敗 (未更新證件連結): {', '.join(failed)}")
+
         elif menu == "➕ 新增股東":
             with st.form("add"):
                 t = st.text_input("統編"); n = st.text_input("姓名")
@@ -657,6 +874,17 @@ def run_main_app(role, user_name, user_id):
                 st.dataframe(df)
             else: st.info("無紀錄")
 
+        elif menu == "📮 寄信失敗紀錄":
+            mailer = get_mailer()
+            st.metric("待寄送", mailer.pending_count())
+            rows = mailer.failures()
+            if rows:
+                st.dataframe(pd.DataFrame(rows, columns=["id", "建立時間", "收件人", "主旨", "嘗試次數", "錯誤訊息"]), hide_index=True)
+                c1, c2 = st.columns(2)
+                if c1.button("重新寄送"): st.success(f"已重新排入 {mailer.retry_failed()} 封"); time.sleep(1); st.rerun()
+                if c2.button("清除紀錄"): mailer.clear_failed(); st.success("已清除"); time.sleep(1); st.rerun()
+            else: st.info("無失敗紀錄")
+
     else:
         if menu == "👤 個人資料維護":
             my = sys.get_shareholder_detail(user_id)
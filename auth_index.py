@@ -0,0 +1,109 @@
+# --- 帳號索引 (記憶體，只存加鹽雜湊) ---
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+AUTH_HASH_ITERATIONS = 600000  # PBKDF2-HMAC-SHA256 迭代次數 (OWASP 2023 建議值)
+AUTH_RELOAD_WORKERS = 4        # 重載時並行雜湊的執行緒數 (pbkdf2 會釋放 GIL)
+AUTH_REFRESH_INTERVAL = 300    # 背景重載間隔 (秒)，同步表單上直接修改的密碼/刪除的帳號
+AUTH_MISS_TTL = 60             # 查無帳號的結果快取秒數
+AUTH_MISS_MAX = 10000          # 查無帳號快取上限
+
+
+class CredentialIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.users = {}    # (is_admin, uid) -> {salt, hash, name, email, hint}
+        self.misses = {}   # (is_admin, uid) -> 到期時間
+        self.touched = {}  # (is_admin, uid) -> 最後單筆異動時間
+
+    @staticmethod
+    def _hash(password, salt):
+        return hashlib.pbkdf2_hmac("sha256", str(password).encode("utf-8"), salt, AUTH_HASH_ITERATIONS)
+
+    def _entry(self, password, name, email, hint, old=None):
+        # 以舊鹽驗證現值，密碼未變更則沿用原鹽與雜湊
+        if old and self.check(old, password): return dict(old, name=name, email=email, hint=hint)
+        salt = secrets.token_bytes(16)
+        return {"salt": salt, "hash": self._hash(password, salt), "name": name, "email": email, "hint": hint}
+
+    @staticmethod
+    def _parse(row, is_admin):
+        # 欄位位置同 system_admin / shareholders 工作表
+        row = [str(x) for x in row]
+        while len(row) < 11: row.append("")
+        uid = row[0].strip()
+        if is_admin: return uid, row[1], "管理員", row[2], row[3]
+        return uid, (row[10] if row[10] != "" else uid), row[1], row[7], row[8]
+
+    def load(self, rows, is_admin, started):
+        # 整份表重建後一次替換；started 為讀表前時間，之後的單筆異動以單筆為準
+        current = self.users
+        parsed = [p for p in (self._parse(r, is_admin) for r in rows) if p[0]]
+        with ThreadPoolExecutor(max_workers=AUTH_RELOAD_WORKERS) as pool:
+            entries = list(pool.map(lambda p: self._entry(p[1], p[2], p[3], p[4], current.get((is_admin, p[0]))), parsed))
+        fresh = {(is_admin, p[0]): e for p, e in zip(parsed, entries)}
+        with self.lock:
+            users = {k: v for k, v in self.users.items() if k[0] != is_admin}
+            for k, v in fresh.items():
+                if self.touched.get(k, 0) <= started: users[k] = v
+            for k, t in self.touched.items():
+                if k[0] == is_admin and t > started:
+                    if k in self.users: users[k] = self.users[k]
+                    else: users.pop(k, None)
+            self.users = users
+            self.touched = {k: t for k, t in self.touched.items() if t > started}
+
+    def put_row(self, row, is_admin):
+        uid, pwd, name, email, hint = self._parse(row, is_admin)
+        if not uid: return
+        key = (is_admin, uid)
+        entry = self._entry(pwd, name, email, hint, self.users.get(key))
+        with self.lock:
+            self.users[key] = entry
+            self.touched[key] = time.monotonic()
+            self.misses.pop(key, None)
+
+    def update(self, is_admin, uid, password=None, **fields):
+        key = (is_admin, str(uid).strip())
+        new_hash = None
+        if password is not None:
+            salt = secrets.token_bytes(16)
+            new_hash = {"salt": salt, "hash": self._hash(password, salt)}
+        with self.lock:
+            # 尚未載入的帳號也要記錄，避免進行中的重載以舊資料覆蓋
+            self.touched[key] = time.monotonic()
+            entry = self.users.get(key)
+            if not entry: return False
+            # 換新物件，避免讀取端看到鹽與雜湊不一致
+            entry = dict(entry)
+            if new_hash: entry.update(new_hash)
+            entry.update({k: v for k, v in fields.items() if k in ("name", "email", "hint")})
+            self.users[key] = entry
+            return True
+
+    def remove(self, is_admin, uid):
+        key = (is_admin, str(uid).strip())
+        with self.lock:
+            self.users.pop(key, None)
+            self.touched[key] = time.monotonic()
+
+    def get(self, is_admin, uid):
+        return self.users.get((is_admin, str(uid).strip()))
+
+    def check(self, entry, password):
+        return hmac.compare_digest(entry["hash"], self._hash(password, entry["salt"]))
+
+    # --- 查無帳號快取 (避免錯誤帳號反覆讀表) ---
+    def is_missing(self, is_admin, uid):
+        exp = self.misses.get((is_admin, str(uid).strip()))
+        return exp is not None and exp > time.monotonic()
+
+    def mark_missing(self, is_admin, uid):
+        with self.lock:
+            if len(self.misses) >= AUTH_MISS_MAX: self.misses.clear()
+            self.misses[(is_admin, str(uid).strip())] = time.monotonic() + AUTH_MISS_TTL
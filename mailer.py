@@ -0,0 +1,201 @@
+# --- 郵件佇列 (SQLite 寄件匣 + 背景執行緒 + 共用 SMTP 連線) ---
+import smtplib
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from email.mime.text import MIMEText
+
+MAIL_BATCH_SIZE = 20      # 每輪批次寄送上限
+MAIL_MAX_RETRIES = 3      # 暫時性錯誤重試次數
+MAIL_RETRY_BASE = 2       # 重試退避基數 (秒)
+MAIL_IDLE_TIMEOUT = 60    # 閒置多久關閉 SMTP 連線 (秒)
+MAIL_PROBE_AFTER = 10     # 連線閒置超過此秒數，寄送前先以 NOOP 確認
+
+# 含敏感內容的範本：內文只留在記憶體，不寫入寄件匣
+MAIL_SENSITIVE_TEMPLATES = {"recovery"}
+
+# 通知信範本
+MAIL_TEMPLATES = {
+    "recovery": ("【股務系統】密碼查詢", "帳號 {uid} 您好：\n\n您的密碼為：{pwd}\n請登入後儘速修改密碼。"),
+    "approved": ("【股務系統】交易申請已核准", "{name} 您好：\n\n您的交易申請 (編號 {req_id}) 已核准，{amount} 股已轉讓予 {buyer}。"),
+    "rejected": ("【股務系統】交易申請已退件", "{name} 您好：\n\n您的交易申請 (編號 {req_id}) 已退件。\n原因：{reason}"),
+    "transfer": ("【股務系統】股權異動通知", "{name} 您好：\n\n{date} 股權過戶：{seller} → {buyer}，{amount} 股 ({reason})。\n目前持股：{shares} 股。"),
+}
+
+
+# 判斷是否為永久性錯誤 (重試無用)
+def is_permanent_error(e):
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return any(code >= 500 for code, _ in e.recipients.values())
+    # 連線類錯誤須先判斷 (SMTPConnectError 亦帶回應碼)
+    if isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return False
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code >= 500
+    if isinstance(e, smtplib.SMTPException):
+        return True
+    # SMTPException 之外的 OSError 為網路問題，可重試
+    if isinstance(e, OSError):
+        return False
+    return isinstance(e, (UnicodeError, ValueError))
+
+
+class MailQueue:
+    def __init__(self, db_path, server, port, user="", password="", use_tls=True, enabled=None,
+                 batch_size=MAIL_BATCH_SIZE, max_retries=MAIL_MAX_RETRIES, retry_base=MAIL_RETRY_BASE,
+                 idle_timeout=MAIL_IDLE_TIMEOUT, autostart=True):
+        self.db_path = db_path
+        self.server, self.port, self.user, self.password, self.use_tls = server, port, user, password, use_tls
+        # 未設定寄件帳號時為模擬模式
+        self.enabled = bool(user) if enabled is None else enabled
+        self.batch_size, self.max_retries = batch_size, max_retries
+        self.retry_base, self.idle_timeout = retry_base, idle_timeout
+        self.conn = None
+        self.last_used = 0.0
+        self.secrets = {}  # outbox id -> 敏感信件內文 (不落地)
+        self.wake = threading.Event()
+        self._init_db()
+        self.worker = threading.Thread(target=self._run, name="mail-queue", daemon=True)
+        if autostart: self.worker.start()
+
+    # --- 寄件匣 (重啟後未寄出的信仍會補寄) ---
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db: yield db
+        finally: db.close()
+
+    def _init_db(self):
+        with self._db() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, to_addr TEXT, subject TEXT, body TEXT,
+                status TEXT DEFAULT 'pending', attempts INTEGER DEFAULT 0, next_at REAL DEFAULT 0,
+                last_error TEXT DEFAULT '', created_at TEXT, sensitive INTEGER DEFAULT 0)""")
+            cols = [r[1] for r in db.execute("PRAGMA table_info(outbox)")]
+            if "sensitive" not in cols: db.execute("ALTER TABLE outbox ADD COLUMN sensitive INTEGER DEFAULT 0")
+            # 重啟後敏感信件內文已不存在，無法補寄
+            db.execute("DELETE FROM outbox WHERE sensitive=1")
+
+    # --- 排入佇列 (不等待寄送) ---
+    def send(self, to, subject, body, sensitive=False):
+        if not to: return False, "無 Email"
+        if not self.enabled: return True, "模擬發送"
+        with self._db() as db:
+            cur = db.execute("INSERT INTO outbox (to_addr, subject, body, created_at, sensitive) VALUES (?, ?, ?, ?, ?)",
+                             (to, subject, "" if sensitive else body, time.strftime("%Y-%m-%d %H:%M:%S"), int(sensitive)))
+            if sensitive: self.secrets[cur.lastrowid] = body
+        self.wake.set()
+        return True, "已排入寄送佇列"
+
+    def send_template(self, to, template, **kw):
+        subject, body = MAIL_TEMPLATES[template]
+        return self.send(to, subject, body.format(**kw), sensitive=template in MAIL_SENSITIVE_TEMPLATES)
+
+    def pending_count(self):
+        with self._db() as db:
+            return db.execute("SELECT COUNT(*) FROM outbox WHERE status='pending'").fetchone()[0]
+
+    # 等待寄件匣清空 (測試或關閉前使用)
+    def flush(self, timeout=30):
+        end = time.monotonic() + timeout
+        while self.pending_count():
+            if time.monotonic() > end: return False
+            self.wake.set(); time.sleep(0.05)
+        return True
+
+    # --- 失敗紀錄 (供管理員查看 / 重寄) ---
+    def failures(self, limit=200):
+        with self._db() as db:
+            return db.execute("SELECT id, created_at, to_addr, subject, attempts, last_error FROM outbox "
+                              "WHERE status='failed' ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+
+    def retry_failed(self):
+        with self._db() as db:
+            n = db.execute("UPDATE outbox SET status='pending', attempts=0, next_at=0 WHERE status='failed'").rowcount
+        self.wake.set()
+        return n
+
+    def clear_failed(self):
+        with self._db() as db:
+            return db.execute("DELETE FROM outbox WHERE status='failed'").rowcount
+
+    # --- SMTP 連線 (重複使用) ---
+    def _connect(self):
+        if self.conn:
+            # 近期用過的連線直接沿用；斷線由 _send 重連
+            if time.monotonic() - self.last_used < MAIL_PROBE_AFTER: return self.conn
+            try:
+                if self.conn.noop()[0] == 250: return self.conn
+            except (smtplib.SMTPException, OSError): pass
+            self._close()
+        conn = smtplib.SMTP(self.server, self.port, timeout=30)
+        if self.use_tls: conn.starttls()
+        if self.user: conn.login(self.user, self.password)
+        self.conn = conn
+        return conn
+
+    def _close(self):
+        if not self.conn: return
+        try: self.conn.quit()
+        except Exception: pass
+        self.conn = None
+
+    def _send(self, msg):
+        reused = self.conn is not None
+        try: self._connect().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # 沿用的連線已被伺服器關閉：立即重連一次
+            if not reused: raise
+            self._close(); self._connect().send_message(msg)
+        self.last_used = time.monotonic()
+
+    def _deliver(self, row):
+        mid, to, subject, body, attempts, sensitive = row
+        if sensitive:
+            body = self.secrets.get(mid)
+            if body is None:
+                with self._db() as db: db.execute("DELETE FROM outbox WHERE id=?", (mid,))
+                return
+        try:
+            msg = MIMEText(body, "plain", "utf-8")
+            msg['Subject'] = subject; msg['To'] = to
+            if self.user: msg['From'] = self.user
+            self._send(msg)
+        except Exception as e:
+            permanent = is_permanent_error(e)
+            if not permanent: self._close()
+            attempts += 1
+            with self._db() as db:
+                if (permanent or attempts > self.max_retries) and sensitive:
+                    # 敏感信件失敗即丟棄，不保留供重寄
+                    db.execute("DELETE FROM outbox WHERE id=?", (mid,)); self.secrets.pop(mid, None)
+                elif permanent or attempts > self.max_retries:
+                    db.execute("UPDATE outbox SET status='failed', attempts=?, last_error=? WHERE id=?", (attempts, str(e), mid))
+                else:
+                    # 延後重試，不阻塞其他信件
+                    next_at = time.time() + self.retry_base * (2 ** (attempts - 1))
+                    db.execute("UPDATE outbox SET attempts=?, next_at=?, last_error=? WHERE id=?", (attempts, next_at, str(e), mid))
+            return
+        with self._db() as db: db.execute("DELETE FROM outbox WHERE id=?", (mid,))
+        self.secrets.pop(mid, None)
+
+    def _run(self):
+        while True:
+            # 先清除旗標再查詢，避免漏接查詢期間排入的信件
+            self.wake.clear()
+            try:
+                with self._db() as db:
+                    batch = db.execute("SELECT id, to_addr, subject, body, attempts, sensitive FROM outbox "
+                                       "WHERE status='pending' AND next_at<=? ORDER BY id LIMIT ?",
+                                       (time.time(), self.batch_size)).fetchall()
+                    due = db.execute("SELECT MIN(next_at) FROM outbox WHERE status='pending'").fetchone()[0]
+                # 寄送時不持有資料庫交易，排入佇列不受影響
+                for row in batch: self._deliver(row)
+            except sqlite3.Error:
+                time.sleep(1); continue
+            if batch: continue
+            # 無待寄信件：等待新信或下一次重試時間，閒置過久則關閉連線
+            wait = self.idle_timeout if due is None else max(0.05, min(self.idle_timeout, due - time.time()))
+            if not self.wake.wait(wait) and due is None: self._close()
@@ -0,0 +1,86 @@
+# --- 批次證件辨識輔助 (ZIP 篩選 / 欄位差異 / 限流) ---
+import io
+import os
+import threading
+import time
+import zipfile
+
+# OCR 批次設定 (並行數上限 / Vision 每秒請求上限)
+OCR_MAX_WORKERS = 8
+VISION_MAX_QPS = 10
+OCR_IMAGE_EXTS = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".bmp": "image/bmp", ".webp": "image/webp"}
+OCR_MAX_IMAGE_BYTES = 10 * 1024 * 1024    # 單張解壓後上限
+OCR_MAX_ZIP_BYTES = 500 * 1024 * 1024     # 全部解壓後上限
+OCR_MAX_FILES = 2000                      # 圖片張數上限
+
+
+# --- 限流器 (多執行緒共用) ---
+class RateLimiter:
+    def __init__(self, qps):
+        self.interval = 1.0 / qps if qps > 0 else 0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        # 預約下一個可用時段，於鎖外等待，避免阻塞其他執行緒排隊
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now: time.sleep(at - now)
+
+
+# --- 開啟 ZIP 並列出圖片 (只讀目錄，不解壓) ---
+def open_image_zip(zip_bytes):
+    try: zf = zipfile.ZipFile(io.BytesIO(zip_bytes))
+    except zipfile.BadZipFile: return False, "無效的 ZIP 檔"
+
+    items, skipped, seen, total = [], [], set(), 0
+    for info in zf.infolist():
+        base = os.path.basename(info.filename)
+        stem, ext = os.path.splitext(base)
+        if info.is_dir() or info.filename.startswith("__MACOSX") or base.startswith("."): continue
+        ext = ext.lower()
+        if ext not in OCR_IMAGE_EXTS: continue
+        tid = stem.strip().upper()
+        # 同一統編只取第一張，其餘標註略過
+        if tid in seen: skipped.append((tid, f"重複統編，已略過 {info.filename}")); continue
+        if info.file_size > OCR_MAX_IMAGE_BYTES: skipped.append((tid, "檔案過大，已略過")); continue
+        seen.add(tid)
+        total += info.file_size
+        items.append((tid, info, OCR_IMAGE_EXTS[ext]))
+
+    if not items and not skipped: return False, "ZIP 內沒有圖片"
+    if len(items) > OCR_MAX_FILES: return False, f"圖片超過 {OCR_MAX_FILES} 張"
+    if total > OCR_MAX_ZIP_BYTES: return False, "ZIP 解壓後過大"
+    return True, (zf, items, skipped)
+
+
+# 讀取單張圖片 (限制實際解壓大小，不信任目錄中的宣告值)
+def read_zip_image(zf, info, limit=OCR_MAX_IMAGE_BYTES):
+    with zf.open(info) as f: data = f.read(limit + 1)
+    if len(data) > limit: raise ValueError("檔案過大")
+    return data
+
+
+# --- 比對名簿列與待更新欄位 ---
+def diff_profile_updates(rows, updates, editor, now):
+    # rows 為含表頭的整張表；回傳 (待寫入儲存格 [(列, 欄, 值)], 異動紀錄, 找不到的統編)
+    headers = [h.strip() for h in rows[0]]
+    # 第一筆資料在工作表第 2 列
+    row_map = {str(r[0]).strip(): (i, r) for i, r in enumerate(rows[1:], start=2) if r}
+    cells, changes, missing = [], [], []
+
+    for tax_id, new_data in updates.items():
+        tax_id = str(tax_id).strip()
+        if tax_id not in row_map: missing.append(tax_id); continue
+        idx, old_row = row_map[tax_id]
+        for key, val in new_data.items():
+            if key not in headers: continue
+            col = headers.index(key)
+            new_val = str(val)
+            old_val = str(old_row[col]) if col < len(old_row) else ""
+            if new_val != old_val:
+                changes.append([now, editor, tax_id, key, old_val, new_val])
+                cells.append((idx, col + 1, new_val))
+    return cells, changes, missing
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import auth_index
+from auth_index import CredentialIndex
+
+
+@pytest.fixture(autouse=True)
+def fast_hash(monkeypatch):
+    # 測試時降低迭代次數
+    monkeypatch.setattr(auth_index, "AUTH_HASH_ITERATIONS", 1000)
+
+
+def sh_row(uid, pwd="", name="王小明", email="a@b", hint="h"):
+    return [uid, name, "Individual", "", "", "", "", email, hint, "10", pwd]
+
+
+def loaded(rows, is_admin=False):
+    ix = CredentialIndex()
+    ix.load(rows, is_admin, time.monotonic())
+    return ix
+
+
+def test_load_and_check():
+    ix = loaded([sh_row("A1", "pw"), sh_row("B2")])
+    ix.load([["admin", "root", "adm@x", "ah"]], True, time.monotonic())
+    assert ix.check(ix.get(False, "A1"), "pw")
+    assert not ix.check(ix.get(False, "A1"), "PW")
+    assert ix.check(ix.get(False, " B2 "), "B2")  # 未設密碼時預設為帳號
+    assert ix.get(True, "admin")["hint"] == "ah" and ix.check(ix.get(True, "admin"), "root")
+    assert ix.get(False, "admin") is None
+    assert "pw" not in repr(ix.users)
+
+
+def test_reload_reuses_unchanged_hash_and_rehashes_changed():
+    rows = [sh_row("A1", "pw1"), sh_row("A2", "pw2")]
+    ix = loaded(rows)
+    a1, a2 = ix.get(False, "A1"), ix.get(False, "A2")
+    rows = [sh_row("A1", "pw1", hint="new"), sh_row("A2", "changed")]
+    ix.load(rows, False, time.monotonic())
+    assert ix.get(False, "A1")["salt"] is a1["salt"] and ix.get(False, "A1")["hint"] == "new"
+    assert ix.get(False, "A2")["salt"] != a2["salt"]
+    assert ix.check(ix.get(False, "A2"), "changed") and not ix.check(ix.get(False, "A2"), "pw2")
+
+
+def test_reload_drops_rows_deleted_from_sheet():
+    ix = loaded([sh_row("A1", "pw"), sh_row("A2", "pw")])
+    ix.load([sh_row("A1", "pw")], False, time.monotonic())
+    assert ix.get(False, "A2") is None
+
+
+def test_password_update_during_load_wins():
+    ix = loaded([sh_row("A1", "old")])
+    started = time.monotonic()
+    assert ix.update(False, "A1", password="new", hint="nh")
+    ix.load([sh_row("A1", "old")], False, started)  # 重載讀到的是更新前的表
+    assert ix.check(ix.get(False, "A1"), "new") and ix.get(False, "A1")["hint"] == "nh"
+    ix.load([sh_row("A1", "new", hint="nh")], False, time.monotonic())
+    assert ix.check(ix.get(False, "A1"), "new")
+
+
+def test_update_of_unloaded_account_blocks_stale_load():
+    ix = CredentialIndex()
+    started = time.monotonic()
+    assert not ix.update(False, "A1", password="new")
+    ix.load([sh_row("A1", "old")], False, started)
+    # 舊資料不得寫入；下次查詢會改讀單列
+    assert ix.get(False, "A1") is None
+    ix.put_row(sh_row("A1", "new"), False)
+    assert ix.check(ix.get(False, "A1"), "new")
+
+
+def test_delete_during_load_wins():
+    ix = loaded([sh_row("A1", "pw")])
+    started = time.monotonic()
+    ix.remove(False, "A1")
+    ix.load([sh_row("A1", "pw")], False, started)
+    assert ix.get(False, "A1") is None
+    # 之後的重載以表單為準
+    ix.load([sh_row("A1", "pw")], False, time.monotonic())
+    assert ix.get(False, "A1") is not None
+
+
+def test_other_partition_untouched_by_load():
+    ix = loaded([sh_row("A1", "pw")])
+    ix.load([["admin", "root", "", ""]], True, time.monotonic())
+    assert ix.get(False, "A1") is not None
+
+
+def test_miss_cache_expires_and_is_cleared_by_put(monkeypatch):
+    monkeypatch.setattr(auth_index, "AUTH_MISS_TTL", 0.05)
+    ix = CredentialIndex()
+    ix.mark_missing(False, "Z9")
+    assert ix.is_missing(False, "Z9") and not ix.is_missing(True, "Z9")
+    time.sleep(0.1)
+    assert not ix.is_missing(False, "Z9")
+
+    monkeypatch.setattr(auth_index, "AUTH_MISS_TTL", 60)
+    ix.mark_missing(False, "Z9")
+    ix.put_row(sh_row("Z9", "pw"), False)
+    assert not ix.is_missing(False, "Z9")
+
+
+def test_miss_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(auth_index, "AUTH_MISS_MAX", 3)
+    ix = CredentialIndex()
+    for i in range(10): ix.mark_missing(False, f"X{i}")
+    assert len(ix.misses) <= 3
@@ -0,0 +1,154 @@
+import os
+import smtplib
+import socketserver
+import sqlite3
+import sys
+import threading
+from email import message_from_bytes
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mailer import MailQueue, is_permanent_error
+
+
+# --- 本機 SMTP 替身 (收件地址含 "bad" 一律 550 拒收) ---
+class StandInSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.noops = 0
+        self.drop_after_data = False
+        self.lock = threading.Lock()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        with self.server.lock: self.server.connections += 1
+        self.reply("220 stand-in ready")
+        rcpts = []
+        while True:
+            line = self.rfile.readline()
+            if not line: return
+            cmd = line.decode().strip()
+            verb = cmd.split(" ")[0].upper()
+            if verb == "EHLO": self.reply("250-stand-in"); self.reply("250 8BITMIME")
+            elif verb == "HELO": self.reply("250 OK")
+            elif verb == "NOOP":
+                with self.server.lock: self.server.noops += 1
+                self.reply("250 OK")
+            elif verb == "MAIL": rcpts = []; self.reply("250 OK")
+            elif verb == "RSET": rcpts = []; self.reply("250 OK")
+            elif verb == "RCPT":
+                if "bad" in cmd: self.reply("550 no such user")
+                else: rcpts.append(cmd); self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 go ahead")
+                data = b""
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b".\r\n", b""): break
+                    data += chunk
+                with self.server.lock: self.server.messages.append(message_from_bytes(data))
+                self.reply("250 queued")
+                if self.server.drop_after_data: return
+            elif verb == "QUIT": self.reply("221 bye"); return
+            else: self.reply("502 not implemented")
+
+
+@pytest.fixture
+def smtp_server():
+    server = StandInSMTP()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown(); server.server_close()
+
+
+def make_queue(tmp_path, server, **kw):
+    return MailQueue(str(tmp_path / "outbox.db"), "127.0.0.1", server.server_address[1],
+                     use_tls=False, enabled=True, **{"retry_base": 0.05, **kw})
+
+
+def test_delivers_queued_mail_over_one_connection(tmp_path, smtp_server):
+    mq = make_queue(tmp_path, smtp_server)
+    for i in range(5):
+        assert mq.send_template("user@example.com", "rejected", name="王小明", req_id=i, reason="資料不符")[0]
+    assert mq.flush(timeout=10)
+    assert len(smtp_server.messages) == 5
+    assert smtp_server.connections == 1
+    assert smtp_server.noops == 0
+    assert "資料不符" in smtp_server.messages[0].get_payload(decode=True).decode("utf-8")
+
+
+def test_permanent_failure_is_recorded_without_retry(tmp_path, smtp_server):
+    mq = make_queue(tmp_path, smtp_server, max_retries=5)
+    mq.send("bad@example.com", "s", "b")
+    mq.send("good@example.com", "s", "b")
+    assert mq.flush(timeout=10)
+    assert len(smtp_server.messages) == 1
+    failed = mq.failures()
+    assert len(failed) == 1 and failed[0][2] == "bad@example.com" and failed[0][4] == 1
+    assert mq.retry_failed() == 1 and mq.flush(timeout=10)
+    assert mq.clear_failed() == 1
+
+
+def test_pending_mail_survives_restart(tmp_path, smtp_server):
+    stopped = make_queue(tmp_path, smtp_server, autostart=False)
+    stopped.send("user@example.com", "s", "b")
+    assert stopped.pending_count() == 1
+    mq = make_queue(tmp_path, smtp_server)
+    assert mq.flush(timeout=10)
+    assert len(smtp_server.messages) == 1
+
+
+def test_disabled_queue_only_simulates(tmp_path, smtp_server):
+    mq = MailQueue(str(tmp_path / "outbox.db"), "127.0.0.1", smtp_server.server_address[1])
+    assert mq.send("user@example.com", "s", "b") == (True, "模擬發送")
+    assert mq.pending_count() == 0
+
+
+def test_error_classification():
+    assert is_permanent_error(smtplib.SMTPRecipientsRefused({"a@b": (550, b"no")}))
+    assert not is_permanent_error(smtplib.SMTPRecipientsRefused({"a@b": (451, b"later")}))
+    assert is_permanent_error(smtplib.SMTPDataError(554, b"rejected"))
+    assert not is_permanent_error(smtplib.SMTPDataError(421, b"busy"))
+    assert not is_permanent_error(smtplib.SMTPServerDisconnected("gone"))
+    assert not is_permanent_error(smtplib.SMTPConnectError(554, b"refused"))
+    assert not is_permanent_error(ConnectionResetError())
+
+
+def outbox_rows(tmp_path):
+    with sqlite3.connect(str(tmp_path / "outbox.db")) as db:
+        return db.execute("SELECT to_addr, body, status FROM outbox").fetchall()
+
+
+def test_recovery_body_is_never_written_to_disk(tmp_path, smtp_server):
+    mq = make_queue(tmp_path, smtp_server, autostart=False)
+    mq.send_template("user@example.com", "recovery", uid="A1", pwd="hunter2")
+    assert outbox_rows(tmp_path) == [("user@example.com", "", "pending")]
+    mq.worker.start()
+    assert mq.flush(timeout=10)
+    assert "hunter2" in smtp_server.messages[0].get_payload(decode=True).decode("utf-8")
+    assert outbox_rows(tmp_path) == []
+
+
+def test_failed_recovery_mail_is_dropped(tmp_path, smtp_server):
+    mq = make_queue(tmp_path, smtp_server)
+    mq.send_template("bad@example.com", "recovery", uid="A1", pwd="hunter2")
+    assert mq.flush(timeout=10)
+    assert outbox_rows(tmp_path) == [] and mq.failures() == [] and mq.secrets == {}
+
+
+def test_reconnects_when_server_drops_idle_connection(tmp_path, smtp_server):
+    smtp_server.drop_after_data = True
+    mq = make_queue(tmp_path, smtp_server, retry_base=60)
+    for _ in range(3): mq.send("user@example.com", "s", "b")
+    assert mq.flush(timeout=10)
+    assert len(smtp_server.messages) == 3 and smtp_server.connections == 3
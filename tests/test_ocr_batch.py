@@ -0,0 +1,79 @@
+import io
+import os
+import sys
+import time
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import ocr_batch
+from ocr_batch import RateLimiter, diff_profile_updates, open_image_zip, read_zip_image
+
+
+def make_zip(files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items(): zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_zip_filters_and_normalises_entries():
+    ok, (zf, items, skipped) = open_image_zip(make_zip({
+        "a123456789.jpg": b"1",
+        "scans/B223456789.PNG": b"2",
+        "c1.bmp": b"3",
+        "d1.webp": b"4",
+        "__MACOSX/._a123456789.jpg": b"x",
+        ".hidden.jpg": b"x",
+        "notes.txt": b"x",
+        "folder/": b"",
+    }))
+    assert ok and not skipped
+    assert [(t, m) for t, _, m in items] == [
+        ("A123456789", "image/jpeg"), ("B223456789", "image/png"), ("C1", "image/bmp"), ("D1", "image/webp")]
+    assert read_zip_image(zf, items[1][1]) == b"2"
+
+
+def test_zip_flags_duplicate_tax_ids():
+    ok, (zf, items, skipped) = open_image_zip(make_zip({"A1.jpg": b"1", "x/a1.png": b"2"}))
+    assert ok
+    assert [t for t, _, _ in items] == ["A1"]
+    assert skipped[0][0] == "A1" and "重複統編" in skipped[0][1]
+
+
+def test_zip_rejects_bad_empty_and_oversized(monkeypatch):
+    assert open_image_zip(b"not a zip") == (False, "無效的 ZIP 檔")
+    assert open_image_zip(make_zip({"readme.txt": b"x"})) == (False, "ZIP 內沒有圖片")
+
+    monkeypatch.setattr(ocr_batch, "OCR_MAX_IMAGE_BYTES", 10)
+    ok, (zf, items, skipped) = open_image_zip(make_zip({"A1.jpg": b"x" * 11, "B1.jpg": b"x"}))
+    assert [t for t, _, _ in items] == ["B1"] and skipped == [("A1", "檔案過大，已略過")]
+    with pytest.raises(ValueError):
+        read_zip_image(zf, zf.getinfo("A1.jpg"), limit=10)
+
+    monkeypatch.setattr(ocr_batch, "OCR_MAX_ZIP_BYTES", 15)
+    assert open_image_zip(make_zip({"A1.jpg": b"x" * 8, "B1.jpg": b"x" * 8})) == (False, "ZIP 解壓後過大")
+
+
+def test_diff_profile_updates_only_changed_cells():
+    rows = [
+        ["tax_id", "name ", "household_address"],
+        ["A1", "王小明", "台北市"],
+        ["B2", "李大華"],
+    ]
+    updates = {"A1": {"name": "王小明", "household_address": "新北市"},
+               "B2": {"household_address": "台中市", "unknown": "x"},
+               "Z9": {"name": "無"}}
+    cells, changes, missing = diff_profile_updates(rows, updates, "Admin", "2026-01-01 00:00:00")
+    assert cells == [(2, 3, "新北市"), (3, 3, "台中市")]
+    assert changes == [["2026-01-01 00:00:00", "Admin", "A1", "household_address", "台北市", "新北市"],
+                       ["2026-01-01 00:00:00", "Admin", "B2", "household_address", "", "台中市"]]
+    assert missing == ["Z9"]
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(50)
+    start = time.monotonic()
+    for _ in range(6): limiter.wait()
+    assert time.monotonic() - start >= 5 * 0.02 - 0.005